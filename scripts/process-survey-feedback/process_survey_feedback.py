@@ -24,10 +24,13 @@ import json
 import logging
 import os
 import re
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Tuple
 from urllib.parse import urljoin, urlsplit, urlunsplit
 
+import numpy as np
 import pandas as pd
+from pandas.io.parsers import TextParser
 
 # Optional imports for offline geocoding (required when --geocode is used)
 try:
@@ -37,20 +40,112 @@ except Exception:
     rg = None
     pycountry = None
 
+# Optional import for Arrow-backed string columns (falls back to pandas' own string dtype)
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except Exception:
+    STRING_DTYPE = "string"
+
+# Optional import for the faster xlsxwriter output engine (falls back to openpyxl)
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_WRITER_KWARGS = {
+        "engine": "xlsxwriter",
+        # Write URLs as plain text: skips xlsxwriter's per-cell URL detection and
+        # its 65,530-hyperlinks-per-sheet limit. constant_memory is not used because
+        # it writes row by row, while pandas writes column by column.
+        "engine_kwargs": {"options": {"strings_to_urls": False}},
+    }
+except Exception:
+    EXCEL_WRITER_KWARGS = {}
+
+# Text columns scanned by the cleaning steps
+STRING_COLUMNS = ("ResponseId", "Q2", "Link URL", "current_url")
+
+# A fairly permissive email regex
+_EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+", re.IGNORECASE)
+_MULTI_SPACE_RE = re.compile(r"\s{2,}")
+
+# Redirect file tokenizer: one alternative per token kind.
+# [^\S\n] is horizontal whitespace, so no token spans a line break.
+_REDIRECT_TOKEN_RE = re.compile(
+    r"""
+    ^[^\S\n]*\#[^\n]*                                                  # comment line
+    | ^[^\S\n]*location\b(?:[^\S\n]+(?P<mod>\S+))?[^\S\n]+(?P<old>/[^\s{]*)  # location with a path
+    | (?P<other_location>^[^\S\n]*location\b[^\n]*)                    # any other location (regex etc.)
+    | return[^\S\n]+\d{3}[^\S\n]+(?P<target>[^;\n]+);                  # return 30x target;
+    | ^[^\S\n]*(?P<two_old>/\S+)[^\S\n]+(?P<two_new>/\S+)               # "/old/path /new/path"
+    """,
+    re.IGNORECASE | re.MULTILINE | re.VERBOSE,
+)
+
+# Hard-coded rewrite applied to Link URL after the redirect file
+KNOWN_ISSUES_REDIRECT = (
+    "https://docs.nginx.com/nginxaas-azure/known-issues/",
+    "https://docs.nginx.com/nginxaas/azure/known-issues/",
+)
+
+# reverse_geocoder switches to its multiprocess search at this many coordinates
+RG_MULTIPROCESS_MIN = 10000
+
 # --- Logging setup ---------------------------------------------------------
 LOGFILE = "cleanup_log.txt"
-logging.basicConfig(
-    filename=LOGFILE,
-    level=logging.INFO,
-    format="%(asctime)s: %(message)s",
-)
-_console = logging.StreamHandler()
-_console.setLevel(logging.INFO)
-_console.setFormatter(logging.Formatter("%(asctime)s: %(message)s"))
-logging.getLogger("").addHandler(_console)
+
+logger = logging.getLogger(__name__)
+
+
+def setup_logging(verbose: bool = False) -> None:
+    """
+    Log to LOGFILE and to the console. Called from main() rather than at import.
+    Per-row details are logged at DEBUG, one record per step, and only emitted with
+    verbose=True. They go to LOGFILE only; the console stays at INFO.
+    """
+    logging.raiseExceptions = False
+    formatter = logging.Formatter("%(asctime)s: %(message)s")
+    file_handler = logging.FileHandler(LOGFILE, delay=True)
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    for handler in (file_handler, console):
+        handler.setFormatter(formatter)
+    logging.basicConfig(level=logging.INFO, handlers=[file_handler, console])
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
 
 
 # --- URL normalization helpers --------------------------------------------
+_SCHEME_RE = re.compile(r"^(https?:)/*")
+_MULTI_SLASH_RE = re.compile(r"/{2,}")
+_IS_ARGS_RE = re.compile(r"\$is_args\$args")
+_NGINX_VAR_RE = re.compile(r"\$[A-Za-z0-9_]+")
+# scheme, netloc and path of an http(s) URL, stopping at the query or fragment
+_ABS_URL_RE = re.compile(r"(https?://)([^/?#]*)([^?#]*)")
+# first path segment of an absolute URL, when another '/' follows it
+_FIRST_SEGMENT_RE = re.compile(r"^https?://[^/?#]+/([^/?#]*)/")
+
+
+def _normalize_absolute_fast(u: str) -> str | None:
+    """
+    Normalize a stripped, scheme-fixed 'http(s)://host/path' URL by slicing instead of
+    urlsplit/urlunsplit. Returns None when the input needs the full parser: no host,
+    tab/newline characters (which urlsplit drops), or a host urlsplit validates
+    (IPv6 brackets, non-ASCII).
+    """
+    m = _ABS_URL_RE.match(u)
+    if not m:
+        return None
+    scheme, netloc, path = m.groups()
+    if not netloc or not netloc.isascii() or "[" in netloc or "]" in netloc:
+        return None
+    if "\t" in u or "\r" in u or "\n" in u:
+        return None
+    path = path or "/"
+    if not path.endswith("/"):
+        path = path + "/"
+    if "//" in path:
+        path = _MULTI_SLASH_RE.sub("/", path)
+    return scheme + netloc + path
+
+
 def normalize_url(url: str) -> str | None:
     """
     Clean a URL or path:
@@ -67,7 +162,11 @@ def normalize_url(url: str) -> str | None:
         return None
 
     # Fix malformed scheme slashes like "https:///..."
-    u = re.sub(r"^(https?:)/*", r"\1//", u)
+    u = _SCHEME_RE.sub(r"\1//", u)
+
+    fast = _normalize_absolute_fast(u)
+    if fast is not None:
+        return fast
 
     parsed = urlsplit(u)
     scheme, netloc, path = parsed.scheme, parsed.netloc, parsed.path or "/"
@@ -76,7 +175,7 @@ def normalize_url(url: str) -> str | None:
     # Ensure single trailing slash and collapse duplicate slashes
     if not path.endswith("/"):
         path = path + "/"
-    path = re.sub(r"/{2,}", "/", path)
+    path = _MULTI_SLASH_RE.sub("/", path)
 
     if scheme and netloc:
         return urlunsplit((scheme, netloc, path, "", ""))
@@ -93,11 +192,20 @@ def ensure_absolute_and_normalize(url: str, base_url: str = "https://docs.nginx.
     """
     if not isinstance(url, str):
         return None
+    return _ensure_absolute_and_normalize(url, base_url)
+
+
+@lru_cache(maxsize=None)
+def _ensure_absolute_and_normalize(url: str, base_url: str) -> str | None:
+    """Memoized body of ensure_absolute_and_normalize; the same paths recur across rows and rules."""
     u = url.strip()
     if not u:
         return None
 
-    u = re.sub(r"^(https?:)/*", r"\1//", u)
+    u = _SCHEME_RE.sub(r"\1//", u)
+    fast = _normalize_absolute_fast(u)
+    if fast is not None:
+        return fast
     parsed = urlsplit(u)
     if parsed.scheme and parsed.netloc:
         return normalize_url(u)
@@ -112,209 +220,332 @@ def strip_nginx_vars_from_url(u: str) -> str | None:
     """
     if not isinstance(u, str):
         return u
-    cleaned = re.sub(r"\$is_args\$args", "", u)
-    cleaned = re.sub(r"\$[A-Za-z0-9_]+", "", cleaned)
-    cleaned = re.sub(r"/{2,}", "/", cleaned)
+    cleaned = _IS_ARGS_RE.sub("", u)
+    cleaned = _NGINX_VAR_RE.sub("", cleaned)
+    cleaned = _MULTI_SLASH_RE.sub("/", cleaned)
     return ensure_absolute_and_normalize(cleaned) or cleaned
 
 
+@lru_cache(maxsize=None)
+def _normalize_and_strip_vars(url: str, base_url: str = "https://docs.nginx.com") -> str | None:
+    """Scalar form of normalize_url_series: normalize, then strip nginx variables."""
+    normalized = ensure_absolute_and_normalize(url, base_url)
+    return strip_nginx_vars_from_url(normalized) if isinstance(normalized, str) else normalized
+
+
+def normalize_url_series(urls: pd.Series, base_url: str = "https://docs.nginx.com") -> pd.Series:
+    """
+    Vectorized ensure_absolute_and_normalize + strip_nginx_vars_from_url for a whole column.
+    Absolute http(s) URLs and plain relative paths are handled with .str operations.
+    Anything else (other schemes, '//host', dot-segment or ';params' references, whitespace or
+    non-ASCII characters, IPv6 hosts, nginx variables in the host) goes through the
+    scalar helpers so the result matches them exactly.
+    Empty strings become missing values.
+    """
+    s = urls.astype(STRING_DTYPE).str.strip()
+    s = s.mask(s == "")
+    s = s.str.replace(r"^(https?:)/*", r"\1//", regex=True)
+
+    present = s.notna()
+    is_abs = s.str.contains(r"^https?://[^/?#]", regex=True, na=False)
+    slow = s.str.contains(r"[^!-~]|[\[\]]|^https?://\$", regex=True, na=False)
+    if urlsplit(base_url).path.strip("/"):
+        # urljoin resolves relative paths against the base path; leave that to urllib
+        slow |= present & ~is_abs
+    else:
+        slow |= ~is_abs & s.str.contains(r"[:;]|^//|(?:^|/)\.\.?(?:[/?#]|$)", regex=True, na=False)
+    fast = present & ~slow
+
+    # Relative paths: join onto base_url
+    rel = fast & ~is_abs
+    if rel.any():
+        s[rel] = base_url.rstrip("/") + "/" + s[rel].str.lstrip("/")
+
+    f = s[fast]
+    f = f.str.replace(r"[?#].*", "", regex=True)
+    f = f.str.replace(r"\$is_args\$args", "", regex=True)
+    f = f.str.replace(r"\$[A-Za-z0-9_]+", "", regex=True)
+    f = f.str.replace(r"/{2,}", "/", regex=True)
+    f = f.str.replace(r"^(https?:)/*", r"\1//", regex=True)
+    s[fast] = f.where(f.str.endswith("/"), f + "/")
+
+    if slow.any():
+        s[slow] = s[slow].astype(object).map(lambda u: _normalize_and_strip_vars(u, base_url))
+    return s
+
+
 # --- Parse nginx-style redirect file -------------------------------------
+@lru_cache(maxsize=None)
 def sanitize_nginx_target(raw_target: str) -> str:
     """Trim and remove quotes/variables from nginx return target string."""
     if not isinstance(raw_target, str):
         return ""
     s = raw_target.strip().strip('"').strip("'")
-    s = re.sub(r"\$is_args\$args", "", s)
-    s = re.sub(r"\$[A-Za-z0-9_]+", "", s)
-    s = re.sub(r"/{2,}", "/", s)
+    s = _IS_ARGS_RE.sub("", s)
+    s = _NGINX_VAR_RE.sub("", s)
+    s = _MULTI_SLASH_RE.sub("/", s)
     return s
 
 
-def load_redirects_from_nginx(nginx_file_path: str, base_url: str = "https://docs.nginx.com") -> List[Tuple[str, str]]:
+def load_redirects_from_nginx(
+    nginx_file_path: str, base_url: str = "https://docs.nginx.com"
+) -> Tuple[Dict[str, str], List[Tuple[str, str]]]:
     """
-    Parse nginx-style redirect file and return list of (old_abs_norm, new_abs_norm).
-    Keeps the first mapping for each old path and sorts by old path length (desc).
+    Parse nginx-style redirect file and return (exact, prefixes):
+    - exact: {old_abs_norm: new_abs_norm} for `location = /old` rules
+    - prefixes: list of (old_abs_norm, new_abs_norm) for all other rules, sorted by old path length (desc)
+    Keeps the first mapping for each old path.
     """
-    mappings: List[Tuple[str, str]] = []
+    # old -> (new, exact); setdefault keeps the first mapping seen for each old path
+    seen: Dict[str, Tuple[str, bool]] = {}
     if not os.path.exists(nginx_file_path):
-        logging.warning(f"Redirect file not found: {nginx_file_path}")
-        return []
-
+        logger.warning("Redirect file not found: %s", nginx_file_path)
+        return {}, []
+
+    def add(old_path: str, target: str, exact: bool) -> None:
+        old_abs_norm = ensure_absolute_and_normalize(old_path, base_url)
+        target_abs_norm = ensure_absolute_and_normalize(sanitize_nginx_target(target), base_url)
+        if old_abs_norm and target_abs_norm:
+            seen.setdefault(old_abs_norm, (target_abs_norm, exact))
+
+    # `location ... /old/path { ... return 301 /new/; }` may span lines, so remember the
+    # open location until its return (or the next location) turns up. No token spans a
+    # line break, so the file is streamed line by line through the tokenizer.
+    pending = None  # (old_path, exact)
     try:
         with open(nginx_file_path, "r", encoding="utf-8") as fh:
-            lines = fh.readlines()
+            for line in fh:
+                for m in _REDIRECT_TOKEN_RE.finditer(line):
+                    if m.group("old") is not None:
+                        # `location = /old` only matches that exact path; other forms match by prefix
+                        pending = (m.group("old"), m.group("mod") == "=")
+                    elif m.group("target") is not None:
+                        if pending:
+                            add(pending[0], m.group("target").strip(), pending[1])
+                            pending = None
+                    elif m.group("two_old") is not None:
+                        # Also accept lines like: "/old/path /new/path" outside location blocks
+                        if pending is None:
+                            add(m.group("two_old"), m.group("two_new"), False)
+                    elif m.group("other_location") is not None:
+                        pending = None
     except Exception as e:
-        logging.error(f"Failed to read redirect file {nginx_file_path}: {e}")
-        return []
-
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if not line or line.startswith("#"):
-            i += 1
-            continue
-
-        # Try to match `location ... /old/path { ... return 301 /new/; }`
-        m_loc = re.match(r"location\b(?:\s+[^\s]+)?\s+(?P<old>/[^\s\{]*)", line, re.IGNORECASE)
-        if m_loc:
-            old_path = m_loc.group("old").strip()
-            # try to find return on same line
-            m_return_same = re.search(r"return\s+\d{3}\s+([^;]+);", line, re.IGNORECASE)
-            if m_return_same:
-                raw_target = m_return_same.group(1).strip()
-                sanitized = sanitize_nginx_target(raw_target)
-                old_abs_norm = ensure_absolute_and_normalize(old_path, base_url)
-                target_abs_norm = ensure_absolute_and_normalize(sanitized, base_url)
-                if old_abs_norm and target_abs_norm:
-                    mappings.append((old_abs_norm, target_abs_norm))
-                i += 1
-                continue
-
-            # search following lines for return
-            j = i + 1
-            found_target = None
-            while j < len(lines):
-                inner = lines[j].strip()
-                if inner.startswith("location "):
-                    break
-                m_return = re.search(r"return\s+\d{3}\s+([^;]+);", inner, re.IGNORECASE)
-                if m_return:
-                    found_target = m_return.group(1).strip()
-                    break
-                j += 1
-            if found_target:
-                sanitized = sanitize_nginx_target(found_target)
-                old_abs_norm = ensure_absolute_and_normalize(old_path, base_url)
-                target_abs_norm = ensure_absolute_and_normalize(sanitized, base_url)
-                if old_abs_norm and target_abs_norm:
-                    mappings.append((old_abs_norm, target_abs_norm))
-            i = j
-            continue
-
-        # Also accept lines like: "/old/path /new/path"
-        m_two = re.match(r"(?P<old>/\S+)\s+(?P<new>/\S+)", line)
-        if m_two:
-            old_path, new_path = m_two.group("old"), m_two.group("new")
-            old_abs_norm = ensure_absolute_and_normalize(old_path, base_url)
-            new_abs_norm = ensure_absolute_and_normalize(sanitize_nginx_target(new_path), base_url)
-            if old_abs_norm and new_abs_norm:
-                mappings.append((old_abs_norm, new_abs_norm))
-            i += 1
-            continue
-
-        i += 1
-
-    # Deduplicate keeping first mapping seen
-    seen = {}
+        logger.error("Failed to read redirect file %s: %s", nginx_file_path, e)
+        return {}, []
+
+    exact_mappings = {old: new for old, (new, exact) in seen.items() if exact}
+    prefix_mappings = [(old, new) for old, (new, exact) in seen.items() if not exact]
+    prefix_mappings.sort(key=lambda t: len(t[0]), reverse=True)
+    logger.info(
+        "Loaded %s redirect mappings (%s exact, %s prefix) from %s",
+        len(seen), len(exact_mappings), len(prefix_mappings), nginx_file_path,
+    )
+    if seen:
+        logger.info("Sample redirect mappings (first 10):")
+        for old, (new, exact) in list(seen.items())[:10]:
+            logger.info("  %s -> %s%s", old, new, " (exact)" if exact else "")
+    return exact_mappings, prefix_mappings
+
+
+def build_prefix_trie(mappings: List[Tuple[str, str]]) -> dict:
+    """
+    Build a character trie over the old URLs of (old, new) mappings.
+    Each node maps the next character to a child node; a node that completes an
+    old URL also stores its (old, new) pair under the "" key.
+    """
+    trie: dict = {}
     for old, new in mappings:
-        if old and new and old not in seen:
-            seen[old] = new
-    final_mappings = list(seen.items())
-    final_mappings.sort(key=lambda t: len(t[0]), reverse=True)
-    logging.info(f"Loaded {len(final_mappings)} redirect mappings from {nginx_file_path}")
-    if final_mappings:
-        logging.info("Sample redirect mappings (first 10):")
-        for old, new in final_mappings[:10]:
-            logging.info(f"  {old} -> {new}")
-    return final_mappings
+        node = trie
+        for ch in old:
+            node = node.setdefault(ch, {})
+        node.setdefault("", (old, new))
+    return trie
+
+
+def longest_prefix_match(trie: dict, url: str) -> Tuple[str, str] | None:
+    """Return the (old, new) mapping whose old URL is the longest prefix of url, or None."""
+    best = trie.get("")
+    node = trie
+    for ch in url:
+        node = node.get(ch)
+        if node is None:
+            break
+        best = node.get("", best)
+    return best
+
+
+def _normalize_unique(urls: pd.Series) -> pd.Series:
+    """
+    normalize_url_series over the distinct values of urls only, mapped back onto every row.
+    Survey exports repeat the same pages many times, so this does far less string work.
+    """
+    uniq = urls.dropna().unique()
+    normalized = normalize_url_series(pd.Series(uniq, dtype=object))
+    return urls.map(dict(zip(uniq, normalized))).astype(STRING_DTYPE)
 
 
-def apply_redirect_mappings_in_place(df: pd.DataFrame, mappings: List[Tuple[str, str]]) -> pd.DataFrame:
+def canonicalize_link_urls(
+    df: pd.DataFrame,
+    mappings: List[Tuple[str, str]],
+    exact: Dict[str, str] | None = None,
+    audit_cols: bool = False,
+) -> pd.DataFrame:
     """
-    Apply redirect mappings to 'Link URL' (and produce 'Canonical Link URL').
-    Writes logs for every changed row. Replaces Link URL with canonical value.
+    Normalize Link URL and current_url (if present) and map Link URL through the redirect
+    table, touching each column once. With audit_cols, preserve originals in audit columns.
+    - Remove query strings and fragments, fix malformed URLs, strip nginx tokens
+    - `mappings` are prefix rules; `exact` rules only match a URL equal to the old path
+    - Then apply KNOWN_ISSUES_REDIRECT as a literal replacement on the mapped URLs
+    Logs the number of canonicalized URLs (each one at DEBUG).
     """
+    if audit_cols:
+        if "Link URL" in df.columns and "Original Link URL" not in df.columns:
+            df["Original Link URL"] = df["Link URL"]
+        if "current_url" in df.columns and "Original current_url" not in df.columns:
+            df["Original current_url"] = df["current_url"]
+
+    if "current_url" in df.columns:
+        df["current_url"] = _normalize_unique(df["current_url"])
+
     if "Link URL" not in df.columns:
-        logging.warning("No 'Link URL' column found; skipping redirect canonicalization.")
+        logger.warning("No 'Link URL' column found; skipping redirect canonicalization.")
         return df
 
-    if "Original Link URL" not in df.columns:
-        df["Original Link URL"] = df["Link URL"]
-
-    # Normalize Link URL and strip nginx vars first
-    df["Link URL"] = df["Link URL"].apply(lambda u: ensure_absolute_and_normalize(u) if isinstance(u, str) else None)
-    df["Link URL"] = df["Link URL"].apply(lambda u: strip_nginx_vars_from_url(u) if isinstance(u, str) else u)
-
-    def map_one(url: str | None) -> str | None:
-        if not isinstance(url, str):
-            return url
-        for old, new in mappings:
-            if url.startswith(old):
-                mapped = url.replace(old, new, 1)
-                mapped = strip_nginx_vars_from_url(mapped) or mapped
-                return mapped
-        return strip_nginx_vars_from_url(url) or url
-
-    df["Canonical Link URL"] = df["Link URL"].apply(map_one)
-
-    changed_mask = (df["Canonical Link URL"].notna()) & (df["Link URL"].notna()) & (df["Canonical Link URL"] != df["Link URL"])
-    changed = df[changed_mask]
-    for idx, row in changed.iterrows():
-        logging.info(f"Row {idx}: URL canonicalized from {row['Link URL']} to {row['Canonical Link URL']}")
-    logging.info(f"Total URLs canonicalized via redirect file: {changed.shape[0]}")
-
-    # Replace Link URL with canonical
-    df["Link URL"] = df["Canonical Link URL"]
+    links = _normalize_unique(df["Link URL"])
+    # Normalizing is idempotent for absolute results; a relative leftover (e.g. a host
+    # made only of nginx variables) becomes absolute on a second pass, so redo just those.
+    relative = links.notna() & ~links.str.startswith("http", na=False)
+    if relative.any():
+        links[relative] = normalize_url_series(links[relative])
+    logger.info("URLs normalized and sanitized (removed query/fragment and nginx tokens).")
+
+    # A URL equal to an old path maps straight to its target whether the rule is
+    # exact or prefix, so all of those are served by one dict lookup per row.
+    whole_url = {old: strip_nginx_vars_from_url(new) or new for old, new in mappings}
+    whole_url.update((old, strip_nginx_vars_from_url(new) or new) for old, new in (exact or {}).items())
+    trie = build_prefix_trie(mappings)
+
+    def map_one(url: str) -> str:
+        match = longest_prefix_match(trie, url)
+        if match:
+            old, new = match
+            mapped = new + url[len(old):]
+            return strip_nginx_vars_from_url(mapped) or mapped
+        return url
+
+    # A prefix can only match a URL with the same first path segment, so URLs whose
+    # segment no rule uses skip the trie walk. Needs every rule below the root.
+    segments = set()
+    for old, _ in mappings:
+        m = _FIRST_SEGMENT_RE.match(old)
+        if not m or not m.group(1):
+            segments = None
+            break
+        segments.add(m.group(1))
+
+    links = links.astype(object).where(links.notna(), None)
+    canonical = links.map(whole_url).astype(object)  # an all-miss map comes back as float64
+    missed = canonical.isna() & links.notna()
+    canonical[missed] = links[missed]
+    if segments is not None:
+        missed &= links.str.extract(_FIRST_SEGMENT_RE, expand=False).isin(frozenset(segments))
+    # Walk the trie once per distinct URL
+    candidates = links[missed]
+    uniq = candidates.unique()
+    canonical[missed] = candidates.map(dict(zip(uniq, map(map_one, uniq))))
+
+    # The known-issues rewrite runs on the redirect results, so it also catches URLs
+    # that a broader redirect (e.g. a section root) moved under the old path.
+    old_pat, new_pat = KNOWN_ISSUES_REDIRECT
+    has_old = canonical.str.contains(old_pat, regex=False, na=False).astype(bool)
+    if has_old.any():
+        canonical[has_old] = canonical[has_old].str.replace(old_pat, new_pat, regex=False)
+    logger.info("Total specific replacements performed: %s", int(has_old.sum()))
+
+    changed_mask = canonical.notna() & links.notna() & (canonical != links)
+    if logger.isEnabledFor(logging.DEBUG) and changed_mask.any():
+        logger.debug("\n".join(
+            f"Row {idx}: URL canonicalized from {old} to {new}"
+            for idx, old, new in zip(links.index[changed_mask], links[changed_mask], canonical[changed_mask])
+        ))
+    logger.info("Total URLs canonicalized via redirect file: %s", int(changed_mask.sum()))
+
+    df["Link URL"] = canonical
     return df
 
 
 # --- Data cleaning steps -------------------------------------------------
-def load_data(file_path: str) -> pd.DataFrame:
+def _read_excel(file_path: str, **kwargs) -> pd.DataFrame:
+    """Read with the Rust-based calamine engine when python-calamine is installed, else pandas' default."""
+    try:
+        return pd.read_excel(file_path, engine="calamine", **kwargs)
+    except ImportError:
+        return pd.read_excel(file_path, **kwargs)
+
+
+def load_data(file_path: str, columns: List[str] | None = None) -> pd.DataFrame:
     """
-    Read Excel with header=None; set first row as header; remove duplicate second header or Q2 subheading row.
+    Read the sheet once as raw cell values; drop a duplicate second header or Q2
+    subheading row if found, then parse the rest with the first row as header.
+    If columns is given, only those columns are parsed.
     Return dataframe with cleaned columns.
     """
-    raw = pd.read_excel(file_path, header=None)
-    logging.info("File read successfully.")
-    logging.info(f"Initial shape (rows x columns): {raw.shape}")
-
-    # First row is header
-    header = list(raw.iloc[0])
-    raw = raw.iloc[1:].reset_index(drop=True)
-
-    if len(raw) > 0:
-        first_data_row = list(raw.iloc[0])
-        if first_data_row == header:
-            logging.info("Second header row detected and removed.")
-            raw = raw.iloc[1:].reset_index(drop=True)
-        elif "Any suggestions for improvement?" in raw.iloc[0].values:
-            logging.info("Subheading row detected and removed.")
-            raw = raw.iloc[1:].reset_index(drop=True)
-
-    df = pd.DataFrame(raw.values, columns=header)
-    logging.info(f"Dataframe shape after header adjustments: {df.shape}")
-    logging.info(f"Columns found: {list(df.columns)}")
+    # Raw cells, untyped and with blanks kept as "", so the header row is compared as it
+    # is in the sheet rather than deduplicated ("Q3.1") with blanks filled in ("Unnamed: 5").
+    # Every column is read, so --columns can't hide the Q2 subheading.
+    raw = _read_excel(file_path, header=None, dtype=object, na_filter=False)
+    logger.info("File read successfully.")
+    logger.info("Initial shape (rows x columns): %s", raw.shape)
+    rows = raw.values.tolist()
+
+    if len(rows) > 1:
+        header_row, first_data_row = rows[0], rows[1]
+        if first_data_row == header_row:
+            logger.info("Second header row detected and removed.")
+            del rows[1]
+        elif "Any suggestions for improvement?" in first_data_row:
+            logger.info("Subheading row detected and removed.")
+            del rows[1]
+
+    usecols = None
+    if columns:
+        wanted = set(columns)
+        usecols = lambda col: col in wanted  # noqa: E731 - a callable tolerates absent names
+
+    if not rows:
+        df = pd.DataFrame()
+    else:
+        # The same parse read_excel(header=0) runs on the sheet data. Text columns are
+        # read straight into (Arrow-backed when available) string dtype, so the .str
+        # operations later run on vectorized kernels without another cast.
+        dtype = {col: STRING_DTYPE for col in STRING_COLUMNS}
+        df = TextParser(rows, header=0, usecols=usecols, dtype=dtype, skip_blank_lines=False).read()
+
+    if columns:
+        missing = [col for col in columns if col not in df.columns]
+        if missing:
+            logger.warning("Requested columns not found in input, ignoring: %s", missing)
+
+    logger.info("Read text columns %s as %s.", [col for col in STRING_COLUMNS if col in df.columns], STRING_DTYPE)
+    logger.info("Dataframe shape after header adjustments: %s", df.shape)
+    logger.info("Columns found: %s", list(df.columns))
     return df
 
 
-def remove_missing_link(df: pd.DataFrame) -> pd.DataFrame:
-    """Drop rows where Link URL is missing and log each removed row index."""
+def missing_link_mask(df: pd.DataFrame) -> pd.Series:
+    """Mark rows where Link URL is missing."""
     if "Link URL" not in df.columns:
-        logging.error("Column 'Link URL' not found. Skipping.")
-        return df
-    before = df.shape[0]
-    missing_mask = df["Link URL"].isnull()
-    if missing_mask.any():
-        for idx in df[missing_mask].index:
-            logging.info(f"Row {idx} deleted because Link URL is missing.")
-        df = df.dropna(subset=["Link URL"]).reset_index(drop=True)
-    logging.info(f"Rows before removing missing Link URL: {before}, after: {df.shape[0]}")
-    return df
+        logger.error("Column 'Link URL' not found. Skipping.")
+        return pd.Series(False, index=df.index)
+    return df["Link URL"].isna()
 
 
-def remove_q2_testing(df: pd.DataFrame) -> pd.DataFrame:
-    """Drop rows where Q2 contains 'testing' (case-insensitive)."""
+def q2_testing_mask(df: pd.DataFrame) -> pd.Series:
+    """Mark rows where Q2 contains 'testing' (case-insensitive)."""
     if "Q2" not in df.columns:
-        logging.warning("Column 'Q2' not found. Skipping Q2 testing removal.")
-        return df
-    before = df.shape[0]
-    mask = df["Q2"].apply(lambda v: isinstance(v, str) and bool(re.search(r"testing", v, re.IGNORECASE)))
-    if mask.any():
-        for idx in df[mask].index:
-            logging.info(f"Row {idx} deleted because Q2 contains 'testing'.")
-        df = df[~mask].reset_index(drop=True)
-    logging.info(f"Rows before removing Q2='testing': {before}, after: {df.shape[0]}")
-    return df
+        logger.warning("Column 'Q2' not found. Skipping Q2 testing removal.")
+        return pd.Series(False, index=df.index)
+    return df["Q2"].str.contains("testing", case=False, regex=False, na=False).astype(bool)
 
 
 def _find_responseid_column(df: pd.DataFrame) -> str | None:
@@ -331,35 +562,65 @@ def _find_responseid_column(df: pd.DataFrame) -> str | None:
     return None
 
 
-def exclude_bogus_responses(df: pd.DataFrame, exclude_file: str) -> pd.DataFrame:
-    """
-    Remove rows whose ResponseId is listed in exclude_file (one id per line).
-    Logs the number removed and enumerates the ResponseIds removed.
-    """
+def load_exclude_ids(exclude_file: str) -> frozenset | None:
+    """Read ResponseIds to exclude from exclude_file (one id per line)."""
     try:
         with open(exclude_file, "r", encoding="utf-8") as f:
-            exclude_ids = {line.strip() for line in f if line.strip()}
-        logging.info(f"Exclude file loaded. Excluding {len(exclude_ids)} ResponseIDs.")
+            exclude_ids = frozenset(line.strip() for line in f if line.strip())
+        logger.info("Exclude file loaded. Excluding %s ResponseIDs.", len(exclude_ids))
+        return exclude_ids
     except Exception as e:
-        logging.error(f"Error reading exclude file '{exclude_file}': {e}")
-        return df
+        logger.error("Error reading exclude file '%s': %s", exclude_file, e)
+        return None
+
+
+def excluded_response_mask(df: pd.DataFrame, exclude_ids: frozenset | None) -> pd.Series:
+    """
+    Mark rows whose ResponseId is in exclude_ids.
+    filter_rows logs the ResponseIds of the rows this actually removes.
+    """
+    if not exclude_ids:
+        return pd.Series(False, index=df.index)
 
     col = _find_responseid_column(df)
     if not col:
-        logging.error("ResponseId column not found. Skipping exclude.")
-        return df
+        logger.error("ResponseId column not found. Skipping exclude.")
+        return pd.Series(False, index=df.index)
+
+    # The stripped ids are also what gets written out, so strip the column in place.
+    # Only a column named exactly ResponseId is read as text; cast the other spellings.
+    df[col] = df[col].astype(STRING_DTYPE).str.strip()
+    return df[col].isin(exclude_ids)
+
 
-    df["ResponseId"] = df["ResponseId"].astype(str).str.strip()
+def filter_rows(df: pd.DataFrame, exclude_ids: frozenset | None = None) -> pd.DataFrame:
+    """
+    Drop rows with a missing Link URL, a Q2 containing 'testing', or an excluded ResponseId.
+    The checks only build boolean masks; the DataFrame is sliced once at the end.
+    Logs each removed row index, the count per reason, and the excluded ResponseIds.
+    """
     before = df.shape[0]
-    to_remove_df = df[df["ResponseId"].isin(exclude_ids)]
-    removed_ids = sorted(to_remove_df["ResponseId"].unique())
-    df = df[~df["ResponseId"].isin(exclude_ids)].reset_index(drop=True)
-    removed_count = before - df.shape[0]
-    logging.info(f"Excluded bogus responses: removed {removed_count} rows based on ResponseId.")
-    if removed_ids:
-        logging.info(f"Removed ResponseIDs ({len(removed_ids)}): {removed_ids}")
-    else:
-        logging.info("No ResponseIDs from exclude-file were found in the dataset.")
+    keep = pd.Series(True, index=df.index)
+    excluded = excluded_response_mask(df, exclude_ids)
+    for mask, reason in (
+        (missing_link_mask(df), "Link URL is missing"),
+        (q2_testing_mask(df), "Q2 contains 'testing'"),
+        (excluded, "ResponseId is in the exclude file"),
+    ):
+        dropped = mask & keep
+        if logger.isEnabledFor(logging.DEBUG) and dropped.any():
+            logger.debug("\n".join(f"Row {idx} deleted because {reason}." for idx in df.index[dropped]))
+        logger.info("Rows removed because %s: %s", reason, int(dropped.sum()))
+        if mask is excluded and exclude_ids and "ResponseId" in df.columns:
+            # only ids whose rows were still there, not ones already dropped above
+            removed_ids = sorted(df.loc[dropped, "ResponseId"].unique().tolist())
+            if removed_ids:
+                logger.info("Removed ResponseIDs (%s): %s", len(removed_ids), removed_ids)
+            else:
+                logger.info("No ResponseIDs from exclude-file were found in the dataset.")
+        keep &= ~mask
+    df = df.loc[keep]
+    logger.info("Rows before filtering: %s, after: %s", before, df.shape[0])
     return df
 
 
@@ -369,69 +630,40 @@ def scrub_emails_in_q2(df: pd.DataFrame) -> pd.DataFrame:
     Logs each row where emails were removed.
     """
     if "Q2" not in df.columns:
-        logging.info("Column 'Q2' not found. Skipping email scrub.")
+        logger.info("Column 'Q2' not found. Skipping email scrub.")
+        return df
+    q2 = df["Q2"]
+    # Most responses contain no email at all; a literal "@" check rules them out cheaply
+    has_at = q2.str.contains("@", regex=False, na=False)
+    if not has_at.any():
+        logger.info("No email addresses found in Q2.")
         return df
-    # A fairly permissive email regex
-    email_pattern = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+", re.IGNORECASE)
-
-    def scrub_cell(cell, idx):
-        if isinstance(cell, str):
-            new_cell, count = email_pattern.subn("", cell)
-            if count > 0:
-                logging.info(f"Row {idx}: Removed {count} email(s) from Q2.")
-                # collapse extra spaces and trim
-                new_cell = re.sub(r"\s{2,}", " ", new_cell).strip()
-                # If the remaining text is empty, return empty string per requirement
-                return new_cell
-        return cell
-
-    df["Q2"] = df.apply(lambda r: scrub_cell(r["Q2"], r.name), axis=1)
-    return df
-
-
-def clean_link_urls(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Normalize Link URL and current_url (if present). Preserve originals in audit columns.
-    Remove query strings and fragments, fix malformed URLs, strip nginx tokens.
-    """
-    if "Link URL" in df.columns and "Original Link URL" not in df.columns:
-        df["Original Link URL"] = df["Link URL"]
-    if "current_url" in df.columns and "Original current_url" not in df.columns:
-        df["Original current_url"] = df["current_url"]
-
-    if "Link URL" in df.columns:
-        df["Link URL"] = df["Link URL"].apply(lambda u: ensure_absolute_and_normalize(u) if isinstance(u, str) else None)
-        df["Link URL"] = df["Link URL"].apply(lambda u: strip_nginx_vars_from_url(u) if isinstance(u, str) else u)
-
-    if "current_url" in df.columns:
-        df["current_url"] = df["current_url"].apply(lambda u: ensure_absolute_and_normalize(u) if isinstance(u, str) else None)
-        df["current_url"] = df["current_url"].apply(lambda u: strip_nginx_vars_from_url(u) if isinstance(u, str) else u)
 
-    logging.info("URLs normalized and sanitized (removed query/fragment and nginx tokens).")
+    # Run the email regex through Python's re on the candidates only: Arrow's regex
+    # kernels treat \w as ASCII and would miss addresses with non-ASCII characters.
+    candidates = q2[has_at].astype(object)
+    counts = candidates.str.count(_EMAIL_RE)
+    hit = counts > 0
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("\n".join(f"Row {idx}: Removed {count} email(s) from Q2." for idx, count in counts[hit].items()))
+    # collapse extra spaces and trim; a cell that held only an email becomes an empty string
+    df.loc[hit.index[hit], "Q2"] = (
+        candidates[hit]
+        .str.replace(_EMAIL_RE, "", regex=True)
+        .str.replace(_MULTI_SPACE_RE, " ", regex=True)
+        .str.strip()
+    )
+    logger.info("Total Q2 cells scrubbed of emails: %s", int(hit.sum()))
     return df
 
 
-def replace_specific_old(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Replace the specific old path with the requested new path in Link URL.
-    Log every change.
-    """
-    if "Link URL" not in df.columns:
-        return df
-    old_pat = "https://docs.nginx.com/nginxaas-azure/known-issues/"
-    new_pat = "https://docs.nginx.com/nginxaas/azure/known-issues/"
-    changed = 0
-    for idx, val in df["Link URL"].items():
-        if isinstance(val, str) and old_pat in val:
-            updated = val.replace(old_pat, new_pat)
-            logging.info(f"Row {idx}: Link URL updated from {val} to {updated} (specific replacement)")
-            df.at[idx, "Link URL"] = updated
-            changed += 1
-    logging.info(f"Total specific replacements performed: {changed}")
-    return df
+# --- Country-only geocoding (cached, offline default) ---------------------
+@lru_cache(maxsize=1)
+def _alpha2_to_country_name() -> Dict[str, str]:
+    """ISO alpha-2 code -> country name, built once from pycountry on first use."""
+    return {country.alpha_2: country.name for country in pycountry.countries}
 
 
-# --- Country-only geocoding (cached, offline default) ---------------------
 def reverse_geocode_country_only(
     df: pd.DataFrame,
     cache_file: str = "geo_country_cache.json",
@@ -444,11 +676,11 @@ def reverse_geocode_country_only(
     - Offline mode uses reverse_geocoder + pycountry for fast local lookups.
     """
     if "LocationLatitude" not in df.columns or "LocationLongitude" not in df.columns:
-        logging.warning("LocationLatitude or LocationLongitude not present; skipping country geocoding.")
+        logger.warning("LocationLatitude or LocationLongitude not present; skipping country geocoding.")
         return df
 
     if rg is None or pycountry is None:
-        logging.error("Offline geocoding packages not installed. Install with: pip install reverse_geocoder pycountry")
+        logger.error("Offline geocoding packages not installed. Install with: pip install reverse_geocoder pycountry")
         return df
 
     # Load cache
@@ -457,9 +689,9 @@ def reverse_geocode_country_only(
         try:
             with open(cache_file, "r", encoding="utf-8") as fh:
                 cache = json.load(fh)
-            logging.info(f"Loaded geocode cache with {len(cache)} entries from {cache_file}")
+            logger.info("Loaded geocode cache with %s entries from %s", len(cache), cache_file)
         except Exception as e:
-            logging.warning(f"Could not read cache file {cache_file}: {e}")
+            logger.warning("Could not read cache file %s: %s", cache_file, e)
 
     def round_coord(v):
         try:
@@ -467,71 +699,52 @@ def reverse_geocode_country_only(
         except Exception:
             return None
 
-    coords = {}  # key -> list of row indices
-    to_lookup = []
-    for idx, row in df.iterrows():
-        lat = row.get("LocationLatitude")
-        lon = row.get("LocationLongitude")
-        if pd.isna(lat) or pd.isna(lon):
-            continue
-        rlat = round_coord(lat)
-        rlon = round_coord(lon)
-        if rlat is None or rlon is None:
-            continue
-        key = f"{rlat},{rlon}"
-        coords.setdefault(key, []).append(idx)
-        if key not in cache:
-            to_lookup.append(key)
-
-    logging.info(f"Unique rounded coords: {len(coords)}; need offline lookup for {len(to_lookup)} coords")
-
-    # Offline mode: reverse_geocoder + pycountry
-    coord_list = []
-    key_list = []
-    for key in to_lookup:
-        lat_s, lon_s = key.split(",")
-        coord_list.append((float(lat_s), float(lon_s)))
-        key_list.append(key)
+    def coord_keys(col: pd.Series) -> pd.Series:
+        # Round each distinct value once; the text matches the "lat,lon" keys of earlier caches
+        values = col.dropna().unique()
+        rounded = {v: round_coord(v) for v in values}
+        return col.map({v: None if r is None else str(r) for v, r in rounded.items()}).astype(object)
 
-    try:
-        results = rg.search(coord_list, mode=1)
-        for k, res in zip(key_list, results):
-            cc = res.get("cc")
-            country_name = None
-            try:
-                country = pycountry.countries.get(alpha_2=cc)
-                country_name = country.name if country else cc
-            except Exception:
-                country_name = cc
-            cache[k] = country_name
-            logging.info(f"Cached {k} -> {country_name} (offline)")
-    except Exception as e:
-        logging.error(f"Offline reverse_geocoder error: {e}")
+    lat_keys = coord_keys(df["LocationLatitude"])
+    lon_keys = coord_keys(df["LocationLongitude"])
+    valid = lat_keys.notna() & lon_keys.notna()
+    keys = lat_keys[valid] + "," + lon_keys[valid]
 
-    # Persist cache
-    try:
-        with open(cache_file, "w", encoding="utf-8") as fh:
-            json.dump(cache, fh, ensure_ascii=False, indent=2)
-        logging.info(f"Wrote geocode cache with {len(cache)} entries to {cache_file}")
-    except Exception as e:
-        logging.warning(f"Failed to write geocode cache to {cache_file}: {e}")
+    unique_keys = keys.unique()
+    to_lookup = [key for key in unique_keys if key not in cache]
+
+    logger.info("Unique rounded coords: %s; need offline lookup for %s coords", len(unique_keys), len(to_lookup))
+
+    if not to_lookup:
+        logger.info("All coordinates found in geocode cache; skipping offline lookup.")
+    else:
+        # Offline mode: reverse_geocoder + pycountry
+        coords = np.array([key.split(",") for key in to_lookup], dtype=np.float64)
+
+        try:
+            # mode=2 splits the search across processes; only worth the startup cost for big batches
+            mode = 2 if len(coords) >= RG_MULTIPROCESS_MIN else 1
+            results = rg.search(list(map(tuple, coords)), mode=mode)
+            country_names = _alpha2_to_country_name()
+            for k, res in zip(to_lookup, results):
+                cc = res.get("cc")
+                country_name = country_names.get(cc, cc)
+                cache[k] = country_name
+                logger.debug("Cached %s -> %s (offline)", k, country_name)
+        except Exception as e:
+            logger.error("Offline reverse_geocoder error: %s", e)
+
+        # Persist cache
+        try:
+            with open(cache_file, "w", encoding="utf-8") as fh:
+                json.dump(cache, fh, ensure_ascii=False, indent=2)
+            logger.info("Wrote geocode cache with %s entries to %s", len(cache), cache_file)
+        except Exception as e:
+            logger.warning("Failed to write geocode cache to %s: %s", cache_file, e)
 
     # Map cache back into DataFrame (Country column only)
-    country_col = []
-    for idx, row in df.iterrows():
-        lat = row.get("LocationLatitude")
-        lon = row.get("LocationLongitude")
-        if pd.isna(lat) or pd.isna(lon):
-            country_col.append(None)
-            continue
-        rlat = round_coord(lat); rlon = round_coord(lon)
-        if rlat is None or rlon is None:
-            country_col.append(None)
-            continue
-        key = f"{rlat},{rlon}"
-        country_col.append(cache.get(key))
-    df["Country"] = country_col
-    logging.info("Added 'Country' column from reverse geocoding results.")
+    df["Country"] = keys.map(cache).reindex(df.index)
+    logger.info("Added 'Country' column from reverse geocoding results.")
     return df
 
 
@@ -549,35 +762,50 @@ def main() -> None:
     # New minimal geocode flags per your request
     parser.add_argument("--geocode", action="store_true", help="Enable country-only reverse geocoding (offline). Default: disabled.")
     parser.add_argument("--geocache", default="geo_country_cache.json", help="Path to geocode cache JSON file (default: geo_country_cache.json).")
+    parser.add_argument(
+        "--columns",
+        type=lambda v: [c.strip() for c in v.split(",") if c.strip()],
+        help="Comma-separated input columns to read (default: all). Unlisted columns are skipped at parse time.",
+    )
+    parser.add_argument(
+        "--audit-cols",
+        action="store_true",
+        help="Keep the pre-cleaning URLs in 'Original Link URL' and 'Original current_url' columns.",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=("xlsx", "csv", "parquet"),
+        default="xlsx",
+        help="Output file format (default: xlsx). csv and parquet use the --output path with that extension.",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Also log every changed or removed row (DEBUG level).")
     args = parser.parse_args()
 
+    setup_logging(verbose=args.verbose)
+
     # Load and prepare dataframe
-    df = load_data(args.input_file)
-    logging.info("First few rows of the DataFrame:\n" + df.head().to_string())
+    df = load_data(args.input_file, columns=args.columns)
+    logger.info("First few rows of the DataFrame:\n%s", df.head().to_string())
 
-    # Cleaning pipeline
-    df = remove_missing_link(df)
-    df = remove_q2_testing(df)
-    df = clean_link_urls(df)
+    # Drop unwanted rows in a single slice
+    if args.exclude_file:
+        exclude_ids = load_exclude_ids(args.exclude_file)
+    else:
+        exclude_ids = None
+        logger.info("No exclude file provided; skipping bogus-response exclusion.")
+    df = filter_rows(df, exclude_ids)
 
-    # Apply redirect mappings (if file exists)
+    # Redirect mappings (from the file if it exists)
+    exact, mappings = {}, []
     if args.redirect_file and os.path.exists(args.redirect_file):
-        mappings = load_redirects_from_nginx(args.redirect_file, base_url="https://docs.nginx.com")
-        if mappings:
-            df = apply_redirect_mappings_in_place(df, mappings)
-        else:
-            logging.info("No mappings loaded from redirect file. Skipping canonicalization.")
+        exact, mappings = load_redirects_from_nginx(args.redirect_file, base_url="https://docs.nginx.com")
+        if not (exact or mappings):
+            logger.info("No mappings loaded from redirect file.")
     else:
-        logging.info(f"Redirect file not provided or not found. Skipping URL canonicalization. ({args.redirect_file})")
+        logger.info("Redirect file not provided or not found. (%s)", args.redirect_file)
 
-    # Do the specific path replacement requested
-    df = replace_specific_old(df)
-
-    # Exclude bogus responses if provided
-    if args.exclude_file:
-        df = exclude_bogus_responses(df, args.exclude_file)
-    else:
-        logging.info("No exclude file provided; skipping bogus-response exclusion.")
+    # Normalize URLs and canonicalize Link URL in one pass
+    df = canonicalize_link_urls(df, mappings, exact, audit_cols=args.audit_cols)
 
     # Scrub emails in Q2 (PII)
     df = scrub_emails_in_q2(df)
@@ -586,18 +814,30 @@ def main() -> None:
     if args.geocode:
         df = reverse_geocode_country_only(df, cache_file=args.geocache)
     else:
-        logging.info("Reverse geocoding disabled (use --geocode to enable).")
+        logger.info("Reverse geocoding disabled (use --geocode to enable).")
 
-    # Final output
+    # Final output; rows keep their input index through the pipeline, renumber once here
+    df = df.reset_index(drop=True)
+    output = args.output
     try:
-        df.to_excel(args.output, sheet_name="Survey Data", index=False)
-        logging.info(f"Cleaned data written to {args.output}")
-        print(f"Cleaned data written to {args.output}")
+        if args.output_format == "xlsx":
+            with pd.ExcelWriter(output, **EXCEL_WRITER_KWARGS) as writer:
+                df.to_excel(writer, sheet_name="Survey Data", index=False)
+        else:
+            output = os.path.splitext(args.output)[0] + "." + args.output_format
+            if args.output_format == "csv":
+                df.to_csv(output, index=False)
+            else:
+                # Arrow needs one type per column; answers often mix numbers and text
+                mixed = {col: STRING_DTYPE for col in df.columns if df[col].dtype == object}
+                df.astype(mixed).to_parquet(output, index=False, compression="zstd")
+        logger.info("Cleaned data written to %s", output)
+        print(f"Cleaned data written to {output}")
     except Exception as e:
-        logging.error(f"Failed to write output Excel file '{args.output}': {e}")
-        print(f"Failed to write output Excel file '{args.output}': {e}")
+        logger.error("Failed to write output file '%s': %s", output, e)
+        print(f"Failed to write output file '{output}': {e}")
 
-    logging.info("Script completed successfully.")
+    logger.info("Script completed successfully.")
 
 
 if __name__ == "__main__":
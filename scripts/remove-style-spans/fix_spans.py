@@ -1,13 +1,81 @@
 #!/usr/bin/env python3
 import argparse
+import concurrent.futures
+import hashlib
+import json
+import mmap
 import os
 import re
+import shutil
+import subprocess
 import sys
+import tempfile
+from functools import lru_cache
 
-SPAN_RE = re.compile(
-    r'<span\s+style="([^"]*?)"\s*>(.*?)</span>',
-    re.IGNORECASE | re.DOTALL
-)
+# bytes patterns: files are matched as raw UTF-8, only the captured spans are decoded.
+# Together they match <span\s+style="([^"]*?)"\s*>(.*?)</span> (case-insensitive),
+# see iter_spans.
+SPAN_START_RE = re.compile(rb'<span\s+style="', re.IGNORECASE)
+SPAN_TAG_END_RE = re.compile(rb'\s*>')
+SPAN_CLOSE_RE = re.compile(rb'</span>', re.IGNORECASE)
+# cheap check for any span opening tag
+SPAN_OPEN_RE = re.compile(rb'<span', re.IGNORECASE)
+# style declarations, allowing whitespace after the colon
+BOLD_RE = re.compile(r'font-weight:\s*bold', re.IGNORECASE)  # also matches bolder
+NOWRAP_RE = re.compile(r'white-space:\s*nowrap', re.IGNORECASE)
+# non-breaking hyphen and space for nowrap text, applied in one pass
+NOWRAP_TABLE = str.maketrans({'-': '&#8209;', ' ': '&nbsp;'})
+# Perl version of process_file for --backend perl: same pattern and rules, run per
+# file in @ARGV. Rewrites only files with a converted span, the same way as
+# write_atomic, and prints each such path followed by a NUL byte.
+SPAN_PERL_SCRIPT = r'''
+use strict;
+use warnings;
+use Cwd qw(abs_path);
+for my $path (@ARGV) {
+    open(my $in, '<:raw', $path) or die "$path: $!\n";
+    my $content = do { local $/; <$in> };
+    close $in;
+    my $changed = 0;
+    $content =~ s{(<span\s+style="([^"]*?)"\s*>(.*?)</span>)}{
+        my ($whole, $style, $text) = ($1, $2, $3);
+        if ($style =~ /font-weight:\s*bold/i) {
+            if ($style =~ /white-space:\s*nowrap/i) {
+                $text =~ s/-/&#8209;/g;
+                $text =~ s/ /&nbsp;/g;
+            }
+            $changed = 1;
+            "**$text**";
+        } else {
+            $whole;
+        }
+    }gise;
+    next unless $changed;
+    my $real = abs_path($path) // $path;
+    my @st = stat $real or die "$real: $!\n";
+    if ($st[3] > 1) {
+        open(my $out, '>:raw', $real) or die "$real: $!\n";
+        print $out $content;
+        close $out or die "$real: $!\n";
+    } else {
+        my $tmp = "$real.$$.tmp";
+        open(my $out, '>:raw', $tmp) or die "$tmp: $!\n";
+        print $out $content;
+        close $out or die "$tmp: $!\n";
+        chmod($st[2] & 07777, $tmp);
+        chown($st[4], $st[5], $tmp);
+        rename($tmp, $real) or die "$real: $!\n";
+    }
+    print "$path\0";
+}
+'''
+# opt-in manifest in rootdir: {"stamp": ..., "files": {relative path: [mtime_ns, size]}}
+CACHE_FILE = '.fix_spans_cache.json'
+
+@lru_cache(maxsize=1024)
+def style_flags(style: str) -> tuple:
+    """(is_bold, is_nowrap) for a style attribute; docs reuse the same few styles."""
+    return BOLD_RE.search(style) is not None, NOWRAP_RE.search(style) is not None
 
 def transform_span(style: str, text: str) -> str:
     """
@@ -15,30 +83,159 @@ def transform_span(style: str, text: str) -> str:
     If it also has white-space: nowrap, replace spaces and hyphens.
     Otherwise, leave the span unchanged.
     """
-    style_lc = style.lower()
-    if 'font-weight:bold' in style_lc or 'font-weight:bolder' in style_lc:
-        # apply nowrap transformations only if requested
-        if 'white-space:nowrap' in style_lc or 'white-space: nowrap' in style_lc:
-            text = text.replace('-', '&#8209;').replace(' ', '&nbsp;')
-        return f'**{text}**'
-    # no bold in style → leave original
-    return None
-
-def process_file(path: str) -> None:
-    with open(path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    def repl(match):
-        style, inner = match.group(1), match.group(2)
-        new = transform_span(style, inner)
-        return new if new is not None else match.group(0)
-
-    new_content = SPAN_RE.sub(repl, content)
-
-    if new_content != content:
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-        print(f'Updated: {path}')
+    is_bold, is_nowrap = style_flags(style)
+    if not is_bold:
+        # no bold in style → leave original
+        return None
+    # apply nowrap transformations only if requested
+    if is_nowrap:
+        text = text.translate(NOWRAP_TABLE)
+    return f'**{text}**'
+
+def iter_spans(buf):
+    """
+    Yield (start, end, style, text) for each span in buf, in order, exactly as
+    re.finditer(rb'(?is)<span\s+style="([^"]*?)"\s*>(.*?)</span>', buf) would.
+    Finds the literal span opening, then the closing quote, '>' and '</span>' with
+    plain searches. The style can't contain a quote, so once one of those searches
+    fails no later span can match either and the scan stops, instead of rescanning
+    to the end of the file for every unclosed span.
+    """
+    pos = 0
+    while True:
+        start = SPAN_START_RE.search(buf, pos)
+        if start is None:
+            return
+        quote = buf.find(b'"', start.end())
+        if quote < 0:
+            return
+        tag_end = SPAN_TAG_END_RE.match(buf, quote + 1)
+        if tag_end is None:
+            # not a match at this opening; keep looking after it
+            pos = start.start() + 1
+            continue
+        close = SPAN_CLOSE_RE.search(buf, tag_end.end())
+        if close is None:
+            return
+        yield start.start(), close.end(), buf[start.end():quote], buf[tag_end.end():close.start()]
+        pos = close.end()
+
+def write_atomic(path: str, content: bytes) -> None:
+    """
+    Write content to a temp file next to path, then rename it over path,
+    so an interrupted run never leaves a half-written file behind.
+    A symlinked path is resolved first so the link target gets the edit, and
+    a file with other hard links is written in place to keep the links shared.
+    The temp file takes over the original's mode and, where allowed, its owner.
+    """
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    if st.st_nlink > 1:
+        with open(path, 'wb') as f:
+            f.write(content)
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        # straight to the descriptor, no buffered file object; no fsync either,
+        # since the docs are under version control and a rerun redoes the edit
+        try:
+            view = memoryview(content)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.chmod(tmp_path, st.st_mode & 0o7777)
+        if hasattr(os, 'chown'):
+            try:
+                os.chown(tmp_path, st.st_uid, st.st_gid)
+            except OSError:
+                pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def process_file(path: str) -> bool:
+    """Rewrite the spans in one file. Returns True if the file was changed."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # most files have no spans at all; skip them without scanning for spans
+            if not SPAN_OPEN_RE.search(mm):
+                return False
+
+            # splice replacements between the untouched stretches of the file
+            parts = []
+            last = 0
+            for start, end, style, inner in iter_spans(mm):
+                new = transform_span(style.decode('utf-8'), inner.decode('utf-8'))
+                if new is None:
+                    continue
+                parts.append(mm[last:start])
+                parts.append(new.encode('utf-8'))
+                last = end
+            if not parts:
+                return False
+            parts.append(mm[last:])
+
+    write_atomic(path, b''.join(parts))
+    return True
+
+def iter_md_files(root: str):
+    """
+    Yield a DirEntry for every .md file under root, recursively. Like os.walk,
+    directory symlinks are not followed and unreadable directories are skipped.
+    """
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir():
+            # skip hidden folders if you like:
+            # if entry.name.startswith('.'): continue
+            if not entry.is_symlink():
+                yield from iter_md_files(entry.path)
+        elif entry.name.lower().endswith('.md') and entry.is_file():
+            yield entry
+
+def process_files_perl(paths: list, jobs: int) -> list:
+    """
+    Run SPAN_PERL_SCRIPT over paths, batched by xargs across jobs perl processes.
+    Returns the paths perl rewrote.
+    """
+    result = subprocess.run(
+        ['xargs', '-0', '-n', '64', '-P', str(max(jobs, 1)), 'perl', '-e', SPAN_PERL_SCRIPT],
+        input=b'\0'.join(os.fsencode(p) for p in paths),
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return [os.fsdecode(p) for p in result.stdout.split(b'\0') if p]
+
+def cache_stamp(backend: str) -> str:
+    """
+    Identify the rules a manifest was built with: a hash of this script plus the
+    backend. Editing the script or switching backend invalidates the manifest.
+    """
+    with open(__file__, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return f'{digest}:{backend}'
+
+def load_cache(cache_path: str, stamp: str) -> dict:
+    """
+    Read the file table of the manifest written by a previous run. A missing or bad
+    file, or one written with other rules (see cache_stamp), means no cache.
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('stamp') != stamp:
+        return {}
+    files = cache.get('files')
+    return files if isinstance(files, dict) else {}
 
 def main():
     parser = argparse.ArgumentParser(
@@ -48,18 +245,80 @@ def main():
         'rootdir',
         help='Directory to recurse through looking for .md files'
     )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of worker processes (default: number of CPUs; 1 runs in-process)'
+    )
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help=f'Skip files unchanged since the last --cache run, tracked in <rootdir>/{CACHE_FILE}'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=('python', 'perl'),
+        default='python',
+        help='Engine for the replacement: python (default) or perl (needs perl and xargs on PATH)'
+    )
     args = parser.parse_args()
 
     if not os.path.isdir(args.rootdir):
         print(f'Error: {args.rootdir} is not a directory', file=sys.stderr)
         sys.exit(1)
+    if args.backend == 'perl' and not (shutil.which('perl') and shutil.which('xargs')):
+        print('Error: --backend perl needs perl and xargs on PATH', file=sys.stderr)
+        sys.exit(1)
+
+    # with --cache, skip files whose mtime and size match the manifest from the last run
+    if args.cache:
+        cache_path = os.path.join(args.rootdir, CACHE_FILE)
+        stamp = cache_stamp(args.backend)
+        cache = load_cache(cache_path, stamp)
+        seen = {}
+        todo = []
+        for entry in iter_md_files(args.rootdir):
+            key = os.path.relpath(entry.path, args.rootdir)
+            st = entry.stat()
+            seen[key] = [st.st_mtime_ns, st.st_size]
+            if cache.get(key) != seen[key]:
+                todo.append(entry.path)
+    else:
+        todo = [entry.path for entry in iter_md_files(args.rootdir)]
+
+    def record(path, updated):
+        if updated:
+            print(f'Updated: {path}')
+            if args.cache:
+                st = os.stat(path)
+                seen[os.path.relpath(path, args.rootdir)] = [st.st_mtime_ns, st.st_size]
+
+    # files are independent, so spread them over worker processes
+    if args.backend == 'perl':
+        if todo:
+            try:
+                updated = process_files_perl(todo, args.jobs)
+            except subprocess.CalledProcessError as e:
+                print(f'Error: perl backend failed (exit status {e.returncode})', file=sys.stderr)
+                sys.exit(1)
+            for path in updated:
+                record(path, True)
+    elif args.jobs > 1 and len(todo) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as ex:
+            results = ex.map(process_file, todo, chunksize=32)
+            for path, updated in zip(todo, results):
+                record(path, updated)
+    else:
+        for path in todo:
+            record(path, process_file(path))
 
-    for dirpath, dirnames, filenames in os.walk(args.rootdir):
-        # skip hidden folders if you like:
-        # dirnames[:] = [d for d in dirnames if not d.startswith('.')]
-        for name in filenames:
-            if name.lower().endswith('.md'):
-                process_file(os.path.join(dirpath, name))
+    if args.cache:
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'stamp': stamp, 'files': seen}, f)
+        except OSError as e:
+            print(f'Warning: could not write {cache_path}: {e}', file=sys.stderr)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
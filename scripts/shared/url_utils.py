@@ -1,4 +1,43 @@
 import os
+import posixpath
+import re
+from functools import lru_cache
+
+# Looked up once instead of on every call; the scripts never change directory
+_CWD = os.getcwd().replace(os.sep, '/')
+
+def _forward_slash_abspath(path):
+    """
+    os.path.abspath with forward slashes. On POSIX, joins relative paths onto the
+    cached working directory instead of asking the OS for it each time.
+    """
+    if os.sep != '/':
+        return os.path.abspath(path).replace(os.sep, '/')
+    if not path.startswith('/'):
+        path = _CWD.rstrip('/') + '/' + path
+    return posixpath.normpath(path)
+
+# id(mapping) -> (mapping, pattern, bases); holding the mapping keeps its id from being reused
+_pattern_cache = {}
+
+def _mapping_pattern(mapping):
+    """
+    Compile (once per mapping object) the mapping keys, without their trailing slash,
+    into one regex alternation ordered longest first, so a match is the longest
+    matching key. Also returns a dict from each stripped key to its base URL.
+    The mapping is treated as read-only once it has been used.
+    """
+    cached = _pattern_cache.get(id(mapping))
+    if cached is None or cached[0] is not mapping:
+        bases = {}
+        for mapping_key, base_url in mapping.items():
+            bases.setdefault(mapping_key.rstrip('/'), base_url)
+        keys = sorted(bases, key=len, reverse=True)
+        # (?!) never matches, for an empty mapping
+        pattern = re.compile('|'.join(map(re.escape, keys)) if keys else '(?!)')
+        cached = (mapping, pattern, bases)
+        _pattern_cache[id(mapping)] = cached
+    return cached[1], cached[2]
 
 def build_production_url(abs_file_path, mapping):
     """
@@ -6,12 +45,23 @@ def build_production_url(abs_file_path, mapping):
       1) Convert the path to absolute form with forward slashes.
       2) Find the portion starting at /content/.
       3) If the path is in /content/includes, return None (skip).
-      4) Find a matching mapping key (for example, /content/nginx/).
+      4) Find the longest matching mapping key (for example, /content/nginx-one/
+         rather than /content/nginx/).
       5) Remove the matched part, strip .md, and remove or adjust _index.
       6) Append leftover path parts to the mapped base URL.
       7) Return "null" if no match is found.
     """
-    abs_path = os.path.abspath(abs_file_path).replace(os.sep, '/')
+    abs_path = _forward_slash_abspath(abs_file_path)
+    _mapping_pattern(mapping)  # register the mapping under its id
+    return _resolve(abs_path, id(mapping))
+
+@lru_cache(maxsize=16384)
+def _resolve(abs_path, mapping_id):
+    """
+    Memoized steps 2-7 of build_production_url for an absolute forward-slash path.
+    The mapping is looked up by id from _pattern_cache, which keeps it hashable.
+    """
+    _, pattern, bases = _pattern_cache[mapping_id]
 
     content_idx = abs_path.find('/content/')
     if content_idx == -1:
@@ -21,19 +71,21 @@ def build_production_url(abs_file_path, mapping):
     if remainder.startswith('/content/includes'):
         return None
 
-    for mapping_key, base_url in mapping.items():
-        mk = mapping_key.rstrip('/')
-        if remainder.startswith(mk):
-            leftover = remainder[len(mk):].lstrip('/')
-            if leftover.lower().endswith('.md'):
-                leftover = leftover[:-3]
-            if leftover == '_index':
-                leftover = ''
-            elif leftover.endswith('/_index'):
-                leftover = leftover.rsplit('/_index', 1)[0]
-
-            if leftover:
-                return f"{base_url}/{leftover}/"
-            else:
-                return f"{base_url}/"
-    return "null"
\ No newline at end of file
+    match = pattern.match(remainder)
+    if match is None:
+        return "null"
+
+    mk = match.group(0)
+    base_url = bases[mk]
+    leftover = remainder[len(mk):].lstrip('/')
+    if leftover.lower().endswith('.md'):
+        leftover = leftover[:-3]
+    if leftover == '_index':
+        leftover = ''
+    else:
+        leftover = leftover.removesuffix('/_index')
+
+    if leftover:
+        return f"{base_url}/{leftover}/"
+    else:
+        return f"{base_url}/"
\ No newline at end of file